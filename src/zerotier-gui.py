@@ -44,32 +44,166 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from subprocess import PIPE, Popen, check_output, STDOUT, CalledProcessError
+from subprocess import PIPE, Popen, run, STDOUT, DEVNULL, CalledProcessError
 import json
+import logging
 from json import JSONDecodeError
 from os import getuid, system, _exit, path, makedirs
 from tkinter import simpledialog
 from webbrowser import open_new_tab
 import sys
 from datetime import datetime
+from contextlib import contextmanager
 import textwrap
 import os
 import pwd
+import shlex
+import secrets
+import threading
+import time
+
+# orjson parses command output faster and is used whenever it is installed,
+# it isn't a requirement though
+try:
+    from orjson import loads as parse_json
+except ImportError:
+    from json import loads as parse_json
 
 BACKGROUND = "#d9d9d9"
 FOREGROUND = "black"
 BUTTON_BACKGROUND = "#ffb253"
 BUTTON_ACTIVE_BACKGROUND = "#ffbf71"
 
+# options shared by every button, see MainWindow.formatted_buttons
+BUTTON_OPTIONS = {
+    "bg": BUTTON_BACKGROUND,
+    "fg": FOREGROUND,
+    "justify": "left",
+    "activebackground": BUTTON_ACTIVE_BACKGROUND,
+    "activeforeground": FOREGROUND,
+}
+
 HISTORY_FILE_DIRECTORY = path.expanduser("~/.local/share/zerotier-gui")
 HISTORY_FILE_NAME = "network_history.json"
+HISTORY_FILE_PATH = path.join(HISTORY_FILE_DIRECTORY, HISTORY_FILE_NAME)
+
+# the user never changes while the program runs, so look it up only once.
+# The home directory comes from the same entry, it is where the install
+# script puts the backend ($HOME)
+PASSWD_ENTRY = pwd.getpwuid(os.getuid())
+USER = PASSWD_ENTRY.pw_name
+HOME = PASSWD_ENTRY.pw_dir
+# stripped from the raw output of sudo, so it is kept as bytes
+SUDO_PROMPT = f"[sudo] password for {USER}: ".encode()
+# home of the static zerotier-one backend, every command is run from here
+ZEROTIER_HOME = f"{HOME}/.zerotier-one"
+
+# commands have to escape the sandbox when running as a flatpak, a native
+# install can run them directly
+IN_FLATPAK = path.exists("/.flatpak-info")
+HOST_PREFIX = ['flatpak-spawn', '--host'] if IN_FLATPAK else []
+
+# wrong sudo passwords accepted at startup before giving up, same as
+# sudo's own default
+MAX_PASSWORD_ATTEMPTS = 3
+# times the backend is probed again after trying to fix its access
+MAX_SETUP_ATTEMPTS = 3
+
+# how long (in seconds) parsed listnetworks output is reused before the
+# command is run again
+CLI_CACHE_TTL = 2
+
+# only the end of a failed command's output is shown in the error dialog
+ERROR_OUTPUT_MAX_LINES = 20
+
+# printed before the exit code that follows the output of probe_backend's
+# command, the root shell adds a random part to it
+BATCH_SEPARATOR = "__SEP__"
+
+# set ZEROTIER_GUI_DEBUG=1 to log every command that is run and its output
+DEBUG_MODE = os.environ.get("ZEROTIER_GUI_DEBUG") == "1"
+
+log = logging.getLogger("zerotier-gui")
 
 
 class MainWindow:
-    def __init__(self):
+    # padded labels of the lines in the network info window
+    INFO_LABELS = {
+        key: label.ljust(25)
+        for key, label in (
+            ("name", "Name:"),
+            ("id", "Network ID:"),
+            ("assignedAddresses", "Assigned Addresses:"),
+            ("status", "Status:"),
+            ("state", "State:"),
+            ("type", "Type:"),
+            ("portDeviceName", "Device:"),
+            ("bridge", "Bridge:"),
+            ("mac", "MAC Address:"),
+            ("mtu", "MTU:"),
+            ("dhcp", "DHCP:"),
+        )
+    }
+    # padded labels of the About window
+    ABOUT_LABELS = {
+        key: label.ljust(40)
+        for key, label in (
+            ("address", "My ZeroTier Address:"),
+            ("version", "ZeroTier Version:"),
+            ("guiVersion", "ZeroTier GUI (Upgraded) Version:"),
+            ("status", "Status:"),
+        )
+    }
+    # padded labels of the join window's info sidebar
+    SIDEBAR_LABELS = {
+        key: label.ljust(20)
+        for key, label in (
+            ("id", "Network ID:"),
+            ("name", "Name:"),
+            ("joinDate", "Last joined date:"),
+            ("joined", "Currently joined:"),
+        )
+    }
+    # (setting, label) of the checkbuttons in the network info window
+    NETWORK_OPTIONS = (
+        ("allowDefault", "Allow Default Route"),
+        ("allowGlobal", "Allow Global IP"),
+        ("allowManaged", "Allow Managed IP"),
+        ("allowDNS", "Allow DNS Configuration"),
+    )
+
+    # window is the withdrawn root that the startup popups were shown over,
+    # networks the list read by the startup probe if it succeeded
+    def __init__(self, window, networks=None):
+        # (timestamp, data) tuple of the last listnetworks output
+        self._networks_cache = None
+        # networks as shown in networkList, row iids index into it
+        self._displayed_networks = []
+        # interface -> operstate, read along with _displayed_networks
+        self._interface_states = {}
+        # ids of the networks in _displayed_networks
+        self._joined_ids = frozenset()
+        # service state shown in serviceStatusLabel, None until it is known
+        self._service_state = None
+        # "user" or "system" once get_service_status found the unit
+        self._service_scope = None
+        # pending after() job that writes the network history to disk
+        self._history_save_job = None
+        # join window kept around between uses, see create_join_network_window
+        self._join_window = None
+        self._refresh_join_window = None
+        # interfaces waiting to be toggled with pkexec
+        self._privileged_queue = set()
+        self._privileged_job = None
+        # a toggle reads the interface states only once the one before it
+        # went through, otherwise both would send the same direction
+        self._toggle_lock = threading.Lock()
+
+        # created once here instead of before every history save
+        makedirs(HISTORY_FILE_DIRECTORY, exist_ok=True)
         self.load_network_history()
 
-        self.window = tk.Tk(className="zerotier-gui")
+        self.window = window
         self.window.title("ZeroTier-GUI")
         self.window.resizable(width=False, height=False)
 
@@ -121,29 +255,21 @@ class MainWindow:
         self.leaveButton = self.formatted_buttons(
             self.bottomFrame,
             text="Leave Network",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.leave_network,
         )
         self.ztCentralButton = self.formatted_buttons(
             self.bottomFrame,
             text="ZeroTier Central",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.zt_central,
         )
         self.toggleConnectionButton = self.formatted_buttons(
             self.bottomFrame,
             text="Disconnect/Connect Interface",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.toggle_interface_connection,
         )
         self.toggleServiceButton = self.formatted_buttons(
             self.bottomFrame,
             text="Toggle ZT Service",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.toggle_service,
         )
         self.serviceStatusLabel = tk.Label(
@@ -152,16 +278,12 @@ class MainWindow:
         self.infoButton = self.formatted_buttons(
             self.bottomFrame,
             text="Network Info",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.see_network_info,
         )
 
         self.exitButton = self.formatted_buttons(
             self.bottomFrame,
             text="Exit",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
             command=self.on_exit,
         )
 
@@ -190,46 +312,101 @@ class MainWindow:
         self.bottomFrame.pack(side="top", fill="x")
 
         # extra configuration
-        self.refresh_networks()
+        if networks is None:
+            self.refresh_networks()
+        else:
+            # the list is only moments old, only the interfaces are missing
+            self.run_async(
+                lambda: (networks, self.get_interface_states()),
+                self.populate_networks,
+            )
         self.update_service_label()
 
-        self.networkList.config(yscrollcommand=self.networkListScrollbar.set)
-        self.networkListScrollbar.config(command=self.networkList.yview)
+        self.networkList.attach_scrollbar(self.networkListScrollbar)
+        self.window.deiconify()
 
+    # the history is read once, every later change is made in memory and
+    # written back by save_network_history
     def load_network_history(self):
-        history_file_path = path.join(
-            HISTORY_FILE_DIRECTORY, HISTORY_FILE_NAME
-        )
-        if not path.isfile(history_file_path):
-            makedirs(HISTORY_FILE_DIRECTORY, exist_ok=True)
-            with open(history_file_path, "w") as f:
-                pass
-        with open(history_file_path, "r") as f:
+        # the file is created on the first save
+        if not path.isfile(HISTORY_FILE_PATH):
+            self.network_history = {}
+            return
+        with open(HISTORY_FILE_PATH, "r") as f:
             try:
                 self.network_history = json.load(f)
             except JSONDecodeError:
                 self.network_history = {}
 
+    # runs func in a worker thread and hands its result to on_done on the
+    # Tk main thread, widgets must only be touched from on_done
+    def run_async(self, func, on_done):
+        def worker():
+            try:
+                result = func()
+            except CalledProcessError as error:
+                self.window.after(0, self.show_command_error, error)
+            # anything else, unparsable output or a missing ip or pkexec
+            # for example, would otherwise end the thread without a word
+            except Exception as error:
+                log.exception("%s failed", func)
+                self.window.after(0, self.show_command_error, error)
+            else:
+                self.window.after(0, on_done, result)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_command_error(self, error):
+        if isinstance(error, CalledProcessError):
+            error = command_error_text(error)
+        show_error(f'Error: "{error}"')
+
     def toggle_service(self):
-        state = self.get_service_status()
-        if state == "active":
-            manage_service("stop")
-        else:
-            manage_service("start")
-        self.update_service_label()
+        def toggle():
+            # the service is only started and stopped from here, so the
+            # state shown in the label is still current
+            state = self._service_state or self.get_service_status()
+            # systemctl waits for the start or stop to finish, so its
+            # outcome is known without asking systemctl again
+            if state == "active":
+                service_command("stop", self._service_scope)
+                return "inactive"
+            service_command("start", self._service_scope)
+            return "active"
+
+        self.run_async(toggle, self.set_service_label)
 
     def get_service_status(self):
-        data = manage_service("show").split("\n")
-        formatted_data = {}
-        for entry in data:
-            key_value = entry.split("=", 1)
-            if len(key_value) == 2:
-                formatted_data[key_value[0]] = key_value[1]
-
-        return formatted_data["ActiveState"]
+        # "systemctl --user show" also succeeds for units that don't exist,
+        # so LoadState is read along with ActiveState in the same call to
+        # tell whether to look at the system unit instead
+        for scope, scopeOptions in (("user", ["--user"]), ("system", [])):
+            try:
+                output = run_command(
+                    [
+                        "systemctl",
+                        *scopeOptions,
+                        "show",
+                        "--property=LoadState,ActiveState",
+                        "zerotier-one",
+                    ],
+                    use_sudo=False,
+                )
+            except CalledProcessError:
+                continue
+            properties = dict(
+                line.partition("=")[::2] for line in output.splitlines()
+            )
+            if properties.get("LoadState", "not-found") != "not-found":
+                self._service_scope = scope
+                return properties.get("ActiveState") or "unknown"
+        return "unknown"
 
     def update_service_label(self):
-        state = self.get_service_status()
+        self.run_async(self.get_service_status, self.set_service_label)
+
+    def set_service_label(self, state):
+        self._service_state = state
         self.serviceStatusLabel.configure(text=f"Service Status: {state} | ")
 
     def zt_central(self):
@@ -238,136 +415,174 @@ class MainWindow:
     def call_see_network_info(self, event):
         self.see_network_info()
 
-    def refresh_paths(self, pathsList, idInList):
-        pathsList.delete(*pathsList.get_children())
-        paths = []
-        # outputs info of paths in json format
-        pathsData = self.get_peers_info()[idInList]["paths"]
+    def refresh_paths(self, pathsList, peerId):
+        def fetch_paths():
+            # the peer is looked up by address, its position may have
+            # changed since the window was opened. A peer that is gone has
+            # no paths left
+            for peer in self.get_peers_info():
+                if peer.get("address", "") == peerId:
+                    return peer.get("paths", [])
+            return []
 
-        # get paths information in a list of tuples
-        for pathPosition in range(len(pathsData)):
-            paths.append(
-                (
-                    pathsData[pathPosition]["active"],
-                    pathsData[pathPosition]["address"],
-                    pathsData[pathPosition]["expired"],
-                    pathsData[pathPosition]["lastReceive"],
-                    pathsData[pathPosition]["lastSend"],
-                    pathsData[pathPosition]["preferred"],
-                    pathsData[pathPosition]["trustedPathId"],
-                )
-            )
+        self.run_async(
+            fetch_paths,
+            lambda pathsData: self.populate_paths(pathsList, pathsData),
+        )
 
-        # set paths in listbox
-        for (
-            pathActive,
-            pathAddress,
-            pathExpired,
-            pathLastReceive,
-            pathLastSend,
-            pathPreferred,
-            pathTrustedId,
-        ) in paths:
-            pathsList.insert(
+    def populate_paths(self, pathsList, pathsData):
+        # the window may have been closed while the paths were fetched
+        if not pathsList.winfo_exists():
+            return
+        # set paths in listbox, tk stringifies the values by itself except
+        # for booleans, which it would show as 0/1
+        pathsList.update_rows(
+            (
                 (
-                    str(pathActive),
-                    str(pathAddress),
-                    str(pathExpired),
-                    str(pathLastReceive),
-                    str(pathLastSend),
-                    str(pathPreferred),
-                    str(pathTrustedId),
+                    (
+                        str(peerPath.get("active", "")),
+                        peerPath.get("address", ""),
+                        str(peerPath.get("expired", "")),
+                        peerPath.get("lastReceive", ""),
+                        peerPath.get("lastSend", ""),
+                        str(peerPath.get("preferred", "")),
+                        peerPath.get("trustedPathId", ""),
+                    ),
+                    False,
                 )
+                for peerPath in pathsData
             )
+        )
 
     def refresh_peers(self, peersList):
-        peersList.delete(*peersList.get_children())
-        peers = []
-        # outputs info of peers in json format
-        peersData = self.get_peers_info()
-
-        # get peers information in a list of tuples
-        for peerPosition in range(len(peersData)):
-            peers.append(
+        def fetch_peers():
+            # outputs info of peers in json format
+            return self.get_peers_info()
+
+        self.run_async(
+            fetch_peers,
+            lambda peersData: self.populate_peers(peersList, peersData),
+        )
+
+    def populate_peers(self, peersList, peersData):
+        # the window may have been closed while the peers were fetched
+        if not peersList.winfo_exists():
+            return
+        # paths by peer address as of this fill, kept on the list itself
+        # as every peers window has its own
+        peersList.peerPaths = {
+            peer.get("address", ""): peer.get("paths", [])
+            for peer in peersData
+        }
+        # set peers in listbox
+        peersList.update_rows(
+            (
                 (
-                    peersData[peerPosition]["address"],
-                    peersData[peerPosition]["version"],
-                    peersData[peerPosition]["role"],
-                    peersData[peerPosition]["latency"],
+                    (
+                        peer.get("address", ""),
+                        "-"
+                        if peer.get("version", "") == "-1.-1.-1"
+                        else peer.get("version", ""),
+                        peer.get("role", ""),
+                        peer.get("latency", ""),
+                    ),
+                    False,
                 )
+                for peer in peersData
             )
-
-        # set peers in listbox
-        for peerAddress, peerVersion, peerRole, peerLatency in peers:
-            if peerVersion == "-1.-1.-1":
-                peerVersion = "-"
-            peersList.insert((peerAddress, peerVersion, peerRole, peerLatency))
+        )
 
     def refresh_networks(self):
-        self.networkList.delete(*self.networkList.get_children())
-        networks = []
+        self.run_async(self.fetch_networks, self.populate_networks)
+
+    def fetch_networks(self):
+        # listnetworks goes through the session's root shell and ip needs
+        # no root, so a refresh doesn't start sudo
         # outputs info of networks in json format
-        networkData = self.get_networks_info()
+        networkData = parse_json(
+            run_zerotier_cli("-j", "listnetworks", raw=True)
+        )
+        return networkData, self.get_interface_states()
 
-        # gets networks information in a list of tuples
-        for networkPosition in range(len(networkData)):
-            interfaceState = self.get_interface_state(
-                networkData[networkPosition]["portDeviceName"]
-            )
-            isDown = interfaceState.lower() == "down"
-            networks.append(
+    def populate_networks(self, result):
+        networkData, interfaceStates = result
+        self._networks_cache = (time.monotonic(), networkData)
+        self._displayed_networks = networkData
+        self._interface_states = interfaceStates
+        self._joined_ids = frozenset(network["nwid"] for network in networkData)
+        # set networks in listbox
+        self.networkList.update_rows(
+            (
                 (
-                    networkData[networkPosition]["id"],
-                    networkData[networkPosition]["name"],
-                    networkData[networkPosition]["status"],
-                    isDown,
+                    (
+                        network["id"],
+                        network["name"] or "Unknown Name",
+                        network["status"],
+                    ),
+                    interfaceStates.get(
+                        network["portDeviceName"], "UNKNOWN"
+                    ).lower()
+                    == "down",
                 )
+                for network in networkData
             )
-        # set networks in listbox
-        for (
-            networkId,
-            networkName,
-            networkStatus,
-            isDown,
-        ) in networks:
-            if not networkName:
-                networkName = "Unknown Name"
-            self.networkList.insert(
-                (networkId, networkName, networkStatus), isDown
-            )
+        )
 
-        self.update_network_history_names()
+        self.update_network_history_names(networkData)
 
-    def update_network_history_names(self):
-        networks = self.get_networks_info()
+    def update_network_history_names(self, networks):
         for network in networks:
             network_id = network["nwid"]
             network_name = network["name"]
-            if network_id in self.network_history:
+            if (
+                network_id in self.network_history
+                and self.network_history[network_id]["name"] != network_name
+            ):
                 self.network_history[network_id]["name"] = network_name
+                self.schedule_history_save()
 
     def save_network_history(self):
-        history_file_path = path.join(
-            HISTORY_FILE_DIRECTORY, HISTORY_FILE_NAME
-        )
-        with open(history_file_path, "w") as f:
+        # write to a temporary file first so a crash mid-write can't
+        # leave a truncated history behind
+        with open(HISTORY_FILE_PATH + ".tmp", "w") as f:
             json.dump(self.network_history, f)
+        os.replace(HISTORY_FILE_PATH + ".tmp", HISTORY_FILE_PATH)
 
-    def get_network_name_by_id(self, network_id):
-        networks = self.get_networks_info()
-        for network in networks:
-            if network_id == network["nwid"]:
-                return network["name"]
+    # coalesces bursts of history changes into a single write
+    def schedule_history_save(self):
+        if self._history_save_job is not None:
+            self.window.after_cancel(self._history_save_job)
+        self._history_save_job = self.window.after(500, self.flush_history)
+
+    def flush_history(self):
+        self._history_save_job = None
+        self.save_network_history()
+
+    # the last listnetworks output, None once it is older than
+    # CLI_CACHE_TTL or was invalidated
+    def cached_networks_info(self):
+        if self._networks_cache is not None:
+            timestamp, data = self._networks_cache
+            if time.monotonic() - timestamp < CLI_CACHE_TTL:
+                return data
+        return None
 
     def get_networks_info(self):
-        res = run_zerotier_cli("-j", "listnetworks")
-        # print(res)
-        resj = json.loads(res)
-        # print(resj)
-        return resj
+        data = self.cached_networks_info()
+        if data is None:
+            data = parse_json(
+                run_zerotier_cli("-j", "listnetworks", raw=True)
+            )
+            self._networks_cache = (time.monotonic(), data)
+        return data
 
+    # peers are only read on an explicit refresh, which always wants them
+    # fresh, so unlike the networks they aren't cached
     def get_peers_info(self):
-        return json.loads(run_zerotier_cli("-j", "peers"))
+        return parse_json(run_zerotier_cli("-j", "peers", raw=True))
+
+    def invalidate_networks_cache(self):
+        self._networks_cache = None
 
     def launch_sub_window(self, title):
         subWindow = tk.Toplevel(self.window, class_="zerotier-gui")
@@ -398,64 +613,66 @@ class MainWindow:
 
         return entry
 
+    def set_selectable_text(self, entry, text):
+        entry.config(state="normal")
+        entry.delete(0, tk.END)
+        entry.insert(0, text)
+        entry.config(state="readonly", width=len(text))
+
     # creates correctly formatted buttons
-    def formatted_buttons(
-        self,
-        frame,
-        text="",
-        bg=BUTTON_BACKGROUND,
-        fg=FOREGROUND,
-        justify="left",
-        activebackground=BUTTON_ACTIVE_BACKGROUND,
-        command="",
-        activeforeground=FOREGROUND,
-    ):
-        button = tk.Button(
-            frame,
-            text=text,
-            bg=bg,
-            fg=fg,
-            justify=justify,
-            activebackground=activebackground,
-            activeforeground=activeforeground,
-            command=command,
+    def formatted_buttons(self, frame, text="", command="", **options):
+        return tk.Button(
+            frame, text=text, command=command, **{**BUTTON_OPTIONS, **options}
         )
+
+    # creates a button and packs it right away, for the button rows at the
+    # bottom of the sub windows
+    def packed_button(self, frame, text, command, side, fill="x"):
+        button = self.formatted_buttons(frame, text=text, command=command)
+        button.pack(side=side, fill=fill)
         return button
 
+    # added right after joining, before the network shows up in
+    # listnetworks, so the name is left for update_network_history_names
+    # to fill in on the next refresh
     def add_network_to_history(self, network_id):
-        network_name = self.get_network_name_by_id(network_id)
-        date = datetime.now()
-        join_date = f"{date.year}/{date.month:0>2}/{date.day:0>2} {date.hour:0>2}:{date.minute:0>2}"
+        join_date = datetime.now().strftime("%Y/%m/%d %H:%M")
         self.network_history[network_id] = {
-            "name": network_name,
+            "name": "",
             "join_date": join_date,
         }
+        self.schedule_history_save()
 
-    def is_on_network(self, network_id):
-        currently_joined = False
-        for network in self.get_networks_info():
-            if currently_joined:
-                break
-            currently_joined = network["nwid"] == network_id
-        return currently_joined
+    def is_on_network(self, network_id, networks):
+        return any(network["nwid"] == network_id for network in networks)
 
     def create_join_network_window(self):
+        # the window is only hidden when closed, so reopening it just
+        # refreshes its data
+        if self._join_window is not None and self._join_window.winfo_exists():
+            self._join_window.deiconify()
+            self._join_window.lift()
+            self._refresh_join_window()
+            return
+
         def join_network(network_id):
             try:
-                if self.is_on_network(network_id):
+                networks = self.get_networks_info()
+                if self.is_on_network(network_id, networks):
                     join_result = "You're already a member of this network."
                     messagebox.showinfo(
                         icon="info", message=join_result, parent=join_window
                     )
                     return
                 run_zerotier_cli("join", network_id)
+                self.invalidate_networks_cache()
                 join_result = "Successfully joined network"
                 self.add_network_to_history(network_id)
                 messagebox.showinfo(
                     icon="info", message=join_result, parent=join_window
                 )
                 self.refresh_networks()
-                join_window.destroy()
+                join_window.withdraw()
             except CalledProcessError:
                 join_result = "Invalid network ID"
                 messagebox.showinfo(
@@ -463,57 +680,70 @@ class MainWindow:
                 )
 
         def populate_network_list():
-            network_history_list.delete(*network_history_list.get_children())
+            rows = []
             for network_id in self.network_history:
                 network_name = self.network_history[network_id]["name"]
                 if network_name == "":
                     network_name = "Unknown Name"
-                network_history_list.insert((network_name, network_id))
+                rows.append(((network_name, network_id), False))
+            network_history_list.update_rows(rows)
 
         def populate_info_sidebar():
             selected_item = network_history_list.focus()
             if selected_item != "":
-                item_info = network_history_list.item(selected_item)["values"]
-                network_id = item_info[1]
+                network_id = network_history_list.row_values(selected_item)[1]
                 join_date = self.network_history[network_id]["join_date"]
                 network_name = self.network_history[network_id]["name"]
                 if network_name == "":
                     network_name = "Unknown Name"
-                currently_joined = self.is_on_network(network_id)
+                # checked against the networks shown in the main window
+                # instead of asking zerotier-cli on every selection
+                currently_joined = network_id in self._joined_ids
             else:
                 network_id = "-"
                 join_date = "-"
                 currently_joined = "-"
                 network_name = "-"
-            network_id_label.configure(
-                text="{:20s}{}".format("Network ID:", network_id)
-            )
-            network_name_label.configure(
-                text="{:20s}{}".format("Name:", network_name)
-            )
-            last_joined_label.configure(
-                text="{:20s}{}".format("Last joined date:", join_date)
-            )
+            labels = self.SIDEBAR_LABELS
+            network_id_label.configure(text=labels["id"] + str(network_id))
+            network_name_label.configure(text=labels["name"] + network_name)
+            last_joined_label.configure(text=labels["joinDate"] + join_date)
             currently_joined_label.configure(
-                text="{:20s}{}".format("Currently joined:", currently_joined)
+                text=labels["joined"] + str(currently_joined)
             )
 
+        def refresh_join_window():
+            network_entry_value.set("")
+            populate_network_list()
+            populate_info_sidebar()
+
         def on_network_selected(event):
             populate_info_sidebar()
             selected_item = network_history_list.focus()
-            item_info = network_history_list.item(selected_item)["values"]
-            network_id = item_info[1]
+            if selected_item == "":
+                network_entry_value.set("")
+                return
+            network_id = network_history_list.row_values(selected_item)[1]
             network_entry_value.set(network_id)
 
         def delete_history_entry():
             selected_item = network_history_list.focus()
-            item_info = network_history_list.item(selected_item)["values"]
-            network_id = item_info[1]
+            if selected_item == "":
+                return
+            network_id = network_history_list.row_values(selected_item)[1]
             self.network_history.pop(network_id)
+            self.schedule_history_save()
             populate_network_list()
+            # the row that moved into the deleted one's place keeps the
+            # focus and selection without a <<TreeviewSelect>>, so the
+            # sidebar and entry are brought up to date here
+            on_network_selected(None)
 
         join_window = self.launch_sub_window("Join Network")
         join_window.configure(bg=BACKGROUND)
+        join_window.protocol("WM_DELETE_WINDOW", join_window.withdraw)
+        self._join_window = join_window
+        self._refresh_join_window = refresh_join_window
 
         network_entry_value = tk.StringVar()
 
@@ -550,10 +780,7 @@ class MainWindow:
         network_history_scrollbar = tk.Scrollbar(
             left_frame, bd=2, bg=BACKGROUND
         )
-        network_history_list.config(
-            yscrollcommand=network_history_scrollbar.set
-        )
-        network_history_scrollbar.config(command=network_history_list.yview)
+        network_history_list.attach_scrollbar(network_history_scrollbar)
 
         network_history_list.style.configure(
             "NoBackground.Treeview", background=BACKGROUND
@@ -599,9 +826,7 @@ class MainWindow:
         close_button = self.formatted_buttons(
             bottom_frame,
             text="Close",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: join_window.destroy(),
+            command=join_window.withdraw,
         )
 
         populate_network_list()
@@ -632,29 +857,33 @@ class MainWindow:
         # get selected network
         try:
             selectionId = int(self.networkList.focus())
-            selectionInfo = self.networkList.item(selectionId)
         except TypeError:
             messagebox.showinfo(
                 icon="info", title="Error", message="No network selected"
             )
             return
-        network = selectionInfo["values"][0]
-        networkName = selectionInfo["values"][1]
+        network, networkName = self.networkList.row_values(selectionId)[:2]
         answer = messagebox.askyesno(
             title="Leave Network",
             message=f"Are you sure you want to "
             f'leave "{networkName}" (ID: {network})?',
         )
-        if answer:
+        if not answer:
+            return
+
+        def leave():
             try:
                 run_zerotier_cli("leave", network)
-                leaveResult = "Successfully left network"
+                return "Successfully left network"
             except CalledProcessError:
-                leaveResult = "Error"
-        else:
-            return
-        messagebox.showinfo(icon="info", message=leaveResult)
-        self.refresh_networks()
+                return "Error"
+
+        def on_left(leaveResult):
+            self.invalidate_networks_cache()
+            messagebox.showinfo(icon="info", message=leaveResult)
+            self.refresh_networks()
+
+        self.run_async(leave, on_left)
 
     def get_status(self):
         status = run_zerotier_cli("status")
@@ -663,7 +892,6 @@ class MainWindow:
 
     def about_window(self):
         statusWindow = self.launch_sub_window("About")
-        status = self.get_status()
 
         # frames
         topFrame = tk.Frame(statusWindow, padx=20, pady=30, bg=BACKGROUND)
@@ -685,36 +913,32 @@ class MainWindow:
         ztAddrLabel = self.selectable_text(
             middleFrame,
             font="Monospace",
-            text="{:40s}{}".format("My ZeroTier Address:", status[2]),
+            text=self.ABOUT_LABELS["address"] + "-",
         )
         versionLabel = tk.Label(
             middleFrame,
             font="Monospace",
-            text="{:40s}{}".format("ZeroTier Version:", status[3]),
+            text=self.ABOUT_LABELS["version"] + "-",
             bg=BACKGROUND,
             fg=FOREGROUND,
         )
         ztGuiVersionLabel = tk.Label(
             middleFrame,
             font="Monospace",
-            text="{:40s}{}".format("ZeroTier GUI (Upgraded) Version:", "2.0.4"),
+            text=self.ABOUT_LABELS["guiVersion"] + "2.0.4",
             bg=BACKGROUND,
             fg=FOREGROUND,
         )
         statusLabel = tk.Label(
             middleFrame,
             font="Monospace",
-            text="{:40s}{}".format("Status:", status[4]),
+            text=self.ABOUT_LABELS["status"] + "-",
             bg=BACKGROUND,
             fg=FOREGROUND,
         )
 
-        closeButton = self.formatted_buttons(
-            bottomTopFrame,
-            text="Close",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: statusWindow.destroy(),
+        self.packed_button(
+            bottomTopFrame, "Close", statusWindow.destroy, "top", fill=None
         )
 
         # credits
@@ -749,8 +973,6 @@ class MainWindow:
         ztGuiVersionLabel.pack(side="top", anchor="w")
         statusLabel.pack(side="top", anchor="w")
 
-        closeButton.pack(side="top")
-
         creditsLabel1.pack(side="top", fill="x")
         creditsLabel2.pack(side="top")
         creditsLabel3.pack(side="top", fill="x")
@@ -761,23 +983,29 @@ class MainWindow:
         bottomTopFrame.pack(side="top", fill="both")
         bottomFrame.pack(side="top", fill="both")
 
-        statusWindow.mainloop()
-
-    def get_interface_state(self, interface):
-        res = run_command(["ip", "--json", "address"])
-        # print(res)
-        sres = res.strip()
-        # print(sres)
-        jres = json.loads(sres)
-        # print(jres)
-        interfaceInfo = jres
-        for info in interfaceInfo:
-            if info["ifname"] == interface:
-                state = info["operstate"]
-                break
-            state = "UNKNOWN"
-
-        return state
+        # zerotier-cli runs in the background, the window is filled in
+        # once it answers
+        def show_status(status):
+            # the window may have been closed in the meantime
+            if not statusWindow.winfo_exists():
+                return
+            labels = self.ABOUT_LABELS
+            self.set_selectable_text(ztAddrLabel, labels["address"] + status[2])
+            versionLabel.configure(text=labels["version"] + status[3])
+            statusLabel.configure(text=labels["status"] + status[4])
+
+        self.run_async(self.get_status, show_status)
+
+    # maps every interface name to its operstate
+    def get_interface_states(self):
+        # reading interface states doesn't need root
+        interfacesOutput = run_command(
+            ["ip", "--json", "--brief", "link"], use_sudo=False, raw=True
+        )
+        return {
+            info["ifname"]: info["operstate"]
+            for info in parse_json(interfacesOutput)
+        }
 
     def toggle_interface_connection(self):
         try:
@@ -789,24 +1017,51 @@ class MainWindow:
             return
 
         # id in list will always be the same as id in json
-        # because the list is generated in the same order
-        currentNetworkInfo = self.get_networks_info()[idInList]
-        currentNetworkInterface = currentNetworkInfo["portDeviceName"]
-
-        state = self.get_interface_state(currentNetworkInterface)
-
-        if state.lower() == "down":
-            run_command(["pkexec", "ip", "link", "set", currentNetworkInterface, "up"])
-        else:
-            run_command(
-                    ["pkexec",
-                    "ip",
-                    "link",
-                    "set",
-                    currentNetworkInterface,
-                    "down"]
+        # because the list is generated in the same order, so reuse the
+        # data the list was built from instead of running zerotier-cli again
+        currentNetworkInterface = self._displayed_networks[idInList][
+            "portDeviceName"
+        ]
+
+        # toggling the same interface again before the queue is flushed
+        # just cancels the pending toggle
+        if currentNetworkInterface in self._privileged_queue:
+            self._privileged_queue.remove(currentNetworkInterface)
+            return
+        self._privileged_queue.add(currentNetworkInterface)
+        if self._privileged_job is None:
+            self._privileged_job = self.window.after(
+                100, self.flush_privileged_queue
             )
 
+    # runs every queued interface toggle behind a single pkexec prompt
+    def flush_privileged_queue(self):
+        interfaces = self._privileged_queue
+        self._privileged_queue = set()
+        self._privileged_job = None
+        if not interfaces:
+            return
+
+        def toggle():
+            # the direction comes from the live state, the one the list
+            # shows may be stale or changed outside the GUI since
+            with self._toggle_lock:
+                states = self.get_interface_states()
+                commands = []
+                for interface in interfaces:
+                    if states.get(interface, "UNKNOWN").lower() == "down":
+                        commands.append(["ip", "link", "set", interface, "up"])
+                    else:
+                        commands.append(
+                            ["ip", "link", "set", interface, "down"]
+                        )
+                return run_privileged_batch(commands)
+
+        self.run_async(toggle, lambda _result: self.on_interfaces_toggled())
+
+    def on_interfaces_toggled(self):
+        # the cached listnetworks output may show the old network status
+        self.invalidate_networks_cache()
         self.refresh_networks()
 
     def see_peer_paths(self, peerList):
@@ -818,8 +1073,7 @@ class MainWindow:
             )
             return
 
-        info = peerList.item(idInList)
-        peerId = info["values"][0]
+        peerId = peerList.row_values(idInList)[0]
 
         pathsWindow = self.launch_sub_window("Peer Path")
         pathsWindow.configure(bg=BACKGROUND)
@@ -849,19 +1103,12 @@ class MainWindow:
             "Trusted Path ID",
         )
 
-        closeButton = self.formatted_buttons(
-            bottomFrame,
-            text="Close",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: pathsWindow.destroy(),
-        )
-        refreshButton = self.formatted_buttons(
+        self.packed_button(bottomFrame, "Close", pathsWindow.destroy, "left")
+        self.packed_button(
             bottomFrame,
-            text="Refresh Paths",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: self.refresh_paths(pathsList, idInList),
+            "Refresh Paths",
+            lambda: self.refresh_paths(pathsList, peerId),
+            "right",
         )
 
         # pack widgets
@@ -869,18 +1116,14 @@ class MainWindow:
         pathsListScrollbar.pack(side="right", fill="both")
         pathsList.pack(side="bottom", fill="x")
 
-        closeButton.pack(side="left", fill="x")
-        refreshButton.pack(side="right", fill="x")
-
         topFrame.pack(side="top", fill="x", pady=(30, 0))
         middleFrame.pack(side="top", fill="x")
         bottomFrame.pack(side="top", fill="x")
 
-        self.refresh_paths(pathsList, idInList)
-        pathsList.config(yscrollcommand=pathsListScrollbar.set)
-        pathsListScrollbar.config(command=pathsList.yview)
-
-        pathsWindow.mainloop()
+        # the paths come with the peers list that was just shown, so there
+        # is no need to ask zerotier-cli again until the user refreshes
+        self.populate_paths(pathsList, peerList.peerPaths.get(peerId, []))
+        pathsList.attach_scrollbar(pathsListScrollbar)
 
     def see_peers(self):
         def call_see_peer_paths(_event):
@@ -901,45 +1144,30 @@ class MainWindow:
         )
         peersList.bind("<Double-Button-1>", call_see_peer_paths)
 
-        closeButton = self.formatted_buttons(
+        self.packed_button(bottomFrame, "Close", peersWindow.destroy, "left")
+        self.packed_button(
             bottomFrame,
-            text="Close",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: peersWindow.destroy(),
+            "Refresh Peers",
+            lambda: self.refresh_peers(peersList),
+            "right",
         )
-        refreshButton = self.formatted_buttons(
+        self.packed_button(
             bottomFrame,
-            text="Refresh Peers",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: self.refresh_peers(peersList),
-        )
-        seePathsButton = self.formatted_buttons(
-            bottomFrame,
-            text="See Paths",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: self.see_peer_paths(peersList),
+            "See Paths",
+            lambda: self.see_peer_paths(peersList),
+            "right",
         )
 
         # pack widgets
         peersListScrollbar.pack(side="right", fill="both")
         peersList.pack(side="bottom", fill="x")
 
-        closeButton.pack(side="left", fill="x")
-        refreshButton.pack(side="right", fill="x")
-        seePathsButton.pack(side="right", fill="x")
-
         topFrame.pack(side="top", fill="x", pady=(30, 0))
         middleFrame.pack(side="top", fill="x")
         bottomFrame.pack(side="top", fill="x")
         self.refresh_peers(peersList)
 
-        peersList.config(yscrollcommand=peersListScrollbar.set)
-        peersListScrollbar.config(command=peersList.yview)
-
-        peersWindow.mainloop()
+        peersList.attach_scrollbar(peersListScrollbar)
 
     def see_network_info(self):
         try:
@@ -949,67 +1177,48 @@ class MainWindow:
                 icon="info", title="Error", message="No network selected"
             )
             return
-        infoWindow = self.launch_sub_window("Network Info")
 
         # id in list will always be the same as id in json
         # because the list is generated in the same order
-        currentNetworkInfo = self.get_networks_info()[idInList]
+        networkId = self._displayed_networks[idInList]["nwid"]
 
-        # frames
-        topFrame = tk.Frame(infoWindow, pady=30, bg=BACKGROUND)
-        middleFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
-
-        allowDefaultFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
-        allowGlobalFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
-        allowManagedFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
-        allowDNSFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
+        def open_from(networks):
+            for network in networks:
+                if network["nwid"] == networkId:
+                    self.open_network_info(network)
+                    return
+            messagebox.showinfo(
+                icon="info", title="Error", message="Network not found"
+            )
 
-        bottomFrame = tk.Frame(infoWindow, pady=10, bg=BACKGROUND)
+        # the cached listnetworks output is used while it is fresh,
+        # otherwise the list is refreshed first as the status, addresses
+        # and options may have changed since
+        networks = self.cached_networks_info()
+        if networks is not None:
+            open_from(networks)
+            return
 
-        # check variables
-        allowDefault = tk.BooleanVar()
-        allowGlobal = tk.BooleanVar()
-        allowManaged = tk.BooleanVar()
-        allowDNS = tk.BooleanVar()
+        def on_fetched(result):
+            self.populate_networks(result)
+            open_from(self._displayed_networks)
 
-        allowDefault.set(currentNetworkInfo["allowDefault"])
-        allowGlobal.set(currentNetworkInfo["allowGlobal"])
-        allowManaged.set(currentNetworkInfo["allowManaged"])
-        allowDNS.set(currentNetworkInfo["allowDNS"])
+        self.run_async(self.fetch_networks, on_fetched)
 
-        # assigned addresses widget generation
-        try:
-            assignedAddressesWidgets = []
-
-            # first widget
-            assignedAddressesWidgets.append(
-                self.selectable_text(
-                    middleFrame,
-                    "{:25s}{}".format(
-                        "Assigned Addresses:",
-                        currentNetworkInfo["assignedAddresses"][0],
-                    ),
-                    font="Monospace",
-                )
-            )
+    def open_network_info(self, currentNetworkInfo):
+        infoWindow = self.launch_sub_window("Network Info")
 
-            # subsequent widgets
-            for address in currentNetworkInfo["assignedAddresses"][1:]:
-                assignedAddressesWidgets.append(
-                    self.selectable_text(
-                        middleFrame,
-                        "{:>42s}".format(address),
-                        font="Monospace",
-                    )
-                )
-        except IndexError:
-            assignedAddressesWidgets.append(
-                self.selectable_text(
-                    middleFrame,
-                    "{:25s}{}".format("Assigned Addresses:", "-"),
-                    font="Monospace",
-                )
-            )
+        # frames
+        topFrame = tk.Frame(infoWindow, pady=30, bg=BACKGROUND)
+        middleFrame = tk.Frame(infoWindow, padx=20, bg=BACKGROUND)
+        optionsFrame = tk.LabelFrame(
+            infoWindow,
+            text="Network Options",
+            padx=20,
+            bg=BACKGROUND,
+            fg=FOREGROUND,
+        )
+        bottomFrame = tk.Frame(infoWindow, pady=10, bg=BACKGROUND)
 
         # widgets
         titleLabel = tk.Label(
@@ -1020,215 +1229,129 @@ class MainWindow:
             fg=FOREGROUND,
         )
 
-        nameLabel = self.selectable_text(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("Name:", currentNetworkInfo["name"]),
-        )
-        idLabel = self.selectable_text(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("Network ID:", currentNetworkInfo["id"]),
-        )
-        statusLabel = tk.Label(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("Status:", currentNetworkInfo["status"]),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        stateLabel = tk.Label(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format(
-                "State:",
-                self.get_interface_state(currentNetworkInfo["portDeviceName"]),
+        # one line per INFO_LABELS entry, in its order, with the extra
+        # assigned addresses on lines of their own below the first one
+        assignedAddresses = currentNetworkInfo["assignedAddresses"] or ["-"]
+        infoValues = dict(
+            currentNetworkInfo,
+            assignedAddresses=assignedAddresses[0],
+            # read in the same refresh as the network itself
+            state=self._interface_states.get(
+                currentNetworkInfo["portDeviceName"], "UNKNOWN"
             ),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        typeLabel = tk.Label(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("Type:", currentNetworkInfo["type"]),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
         )
-        deviceLabel = self.selectable_text(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format(
-                "Device:", currentNetworkInfo["portDeviceName"]
-            ),
-        )
-        bridgeLabel = tk.Label(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("Bridge:", currentNetworkInfo["bridge"]),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        macLabel = self.selectable_text(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("MAC Address:", currentNetworkInfo["mac"]),
-        )
-        mtuLabel = self.selectable_text(
-            middleFrame,
-            font="Monospace",
-            text="{:25s}{}".format("MTU:", currentNetworkInfo["mtu"]),
-        )
-        dhcpLabel = tk.Label(
+        infoLines = []
+        for key, label in self.INFO_LABELS.items():
+            infoLines.append(label + str(infoValues[key]))
+            if key == "assignedAddresses":
+                infoLines.extend(
+                    address.rjust(42) for address in assignedAddresses[1:]
+                )
+        # a single read-only text widget, its content can still be selected
+        # and copied
+        infoText = tk.Text(
             middleFrame,
+            height=len(infoLines),
+            width=max(map(len, infoLines)),
             font="Monospace",
-            text="{:25s}{}".format("DHCP:", currentNetworkInfo["dhcp"]),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-
-        allowDefaultLabel = tk.Label(
-            allowDefaultFrame,
-            font="Monospace",
-            text="{:24s}".format("Allow Default Route"),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        allowDefaultCheck = tk.Checkbutton(
-            allowDefaultFrame,
-            variable=allowDefault,
-            command=lambda: change_config("allowDefault", allowDefault.get()),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-            highlightthickness=0,
-        )
-
-        allowGlobalLabel = tk.Label(
-            allowGlobalFrame,
-            font="Monospace",
-            text="{:24s}".format("Allow Global IP"),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        allowGlobalCheck = tk.Checkbutton(
-            allowGlobalFrame,
-            variable=allowGlobal,
-            command=lambda: change_config("allowGlobal", allowGlobal.get()),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-            highlightthickness=0,
-        )
-
-        allowManagedLabel = tk.Label(
-            allowManagedFrame,
-            font="Monospace",
-            text="{:24s}".format("Allow Managed IP"),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        allowManagedCheck = tk.Checkbutton(
-            allowManagedFrame,
-            variable=allowManaged,
-            command=lambda: change_config("allowManaged", allowManaged.get()),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-            highlightthickness=0,
-        )
-
-        allowDNSLabel = tk.Label(
-            allowDNSFrame,
-            font="Monospace",
-            text="{:24s}".format("Allow DNS Configuration"),
-            bg=BACKGROUND,
-            fg=FOREGROUND,
-        )
-        allowDNSCheck = tk.Checkbutton(
-            allowDNSFrame,
-            variable=allowDNS,
-            command=lambda: change_config("allowDNS", allowDNS.get()),
             bg=BACKGROUND,
             fg=FOREGROUND,
+            bd=0,
             highlightthickness=0,
+            relief=tk.FLAT,
         )
+        infoText.insert("1.0", "\n".join(infoLines))
+        infoText.config(state="disabled")
+        infoText.pack(side="top", anchor="w")
 
-        closeButton = self.formatted_buttons(
-            bottomFrame,
-            text="Close",
-            bg=BUTTON_BACKGROUND,
-            activebackground=BUTTON_ACTIVE_BACKGROUND,
-            command=lambda: infoWindow.destroy(),
+        # check variables, kept so they aren't collected while the window
+        # is open
+        optionVars = {}
+        for setting, label in self.NETWORK_OPTIONS:
+            optionVars[setting] = tk.BooleanVar(
+                value=currentNetworkInfo[setting]
+            )
+            tk.Checkbutton(
+                optionsFrame,
+                text=label,
+                font="Monospace",
+                variable=optionVars[setting],
+                command=lambda setting=setting: change_config(
+                    setting, optionVars[setting].get()
+                ),
+                bg=BACKGROUND,
+                fg=FOREGROUND,
+                highlightthickness=0,
+            ).pack(side="top", anchor="w")
+
+        self.packed_button(
+            bottomFrame, "Close", infoWindow.destroy, "top", fill=None
         )
 
         # pack widgets
         titleLabel.pack(side="top", anchor="n")
 
-        nameLabel.pack(side="top", anchor="w")
-        idLabel.pack(side="top", anchor="w")
-
-        # assigned addresses
-        for widget in assignedAddressesWidgets:
-            widget.pack(side="top", anchor="w")
-
-        statusLabel.pack(side="top", anchor="w")
-        stateLabel.pack(side="top", anchor="w")
-        typeLabel.pack(side="top", anchor="w")
-        deviceLabel.pack(side="top", anchor="w")
-        bridgeLabel.pack(side="top", anchor="w")
-        macLabel.pack(side="top", anchor="w")
-        mtuLabel.pack(side="top", anchor="w")
-        dhcpLabel.pack(side="top", anchor="w")
-
-        allowDefaultLabel.pack(side="left", anchor="w")
-        allowDefaultCheck.pack(side="left", anchor="w")
-
-        allowGlobalLabel.pack(side="left", anchor="w")
-        allowGlobalCheck.pack(side="left", anchor="w")
-
-        allowManagedLabel.pack(side="left", anchor="w")
-        allowManagedCheck.pack(side="left", anchor="w")
-
-        allowDNSLabel.pack(side="left", anchor="w")
-        allowDNSCheck.pack(side="left", anchor="w")
-
-        closeButton.pack(side="top")
-
         topFrame.pack(side="top", fill="both")
         middleFrame.pack(side="top", fill="both")
-
-        allowDefaultFrame.pack(side="top", fill="both")
-        allowGlobalFrame.pack(side="top", fill="both")
-        allowManagedFrame.pack(side="top", fill="both")
-        allowDNSFrame.pack(side="top", fill="both")
-
+        optionsFrame.pack(side="top", fill="both", padx=20, pady=(10, 0))
         bottomFrame.pack(side="top", fill="both")
 
         # checkbutton functions
+        # settings changed in a quick burst are sent together
+        pendingConfig = {}
+        configJob = None
+
         def change_config(config, value):
+            nonlocal configJob
             # zerotier-cli only accepts int values
-            value = int(value)
-            try:
-                run_zerotier_cli(
-                        "set",
-                        currentNetworkInfo["id"],
-                        f"{config}={value}",
-                    stderr_to_stdout=True,
-                )
-            except CalledProcessError as error:
-                error = error.output.strip()
-                messagebox.showinfo(
-                    title="Error", message=f'Error: "{error}"', icon="error"
-                )
+            pendingConfig[config] = int(value)
+            if configJob is not None:
+                self.window.after_cancel(configJob)
+            configJob = self.window.after(150, flush_config)
+
+        def flush_config():
+            nonlocal configJob
+            configJob = None
+            settings = [
+                ("set", currentNetworkInfo["id"], f"{config}={value}")
+                for config, value in pendingConfig.items()
+            ]
+            pendingConfig.clear()
+            # failures are reported by run_async
+            self.run_async(
+                lambda: run_zerotier_cli_batch(settings),
+                lambda _output: self.on_config_changed(),
+            )
 
-        # needed to stop local variables from being destroyed before the window
-        infoWindow.mainloop()
+    def on_config_changed(self):
+        # the network list and its data still hold the old settings
+        self.invalidate_networks_cache()
+        self.refresh_networks()
 
     def on_exit(self):
-        self.save_network_history()
+        # every change schedules a save, so without a pending one the file
+        # on disk is already up to date
+        if self._history_save_job is not None:
+            self.window.after_cancel(self._history_save_job)
+            self.save_network_history()
+        ZEROTIER_SHELL.close()
         self.window.destroy()
 
 
 class TreeView(ttk.Treeview):
+    # rows are added to the list a page at a time as it is scrolled down
+    PAGE_SIZE = 100
+    # alternating row colors, indexed by the lowest bit of the position
+    STRIPE_TAGS = ("even", "odd")
+
     def __init__(self, root, *columns):
         super().__init__(root)
+        # (values, disabled) of every row currently in the list
+        self._rows = []
+        # rows that are waiting to be loaded into the list
+        self._pending_rows = []
+        # set while update_rows has Tk and the two lists above out of step
+        self._updating = False
 
         self["columns"] = tuple(columns)
         self.column("#0", width=0, stretch=tk.NO)
@@ -1248,30 +1371,257 @@ class TreeView(ttk.Treeview):
         self.tag_configure("even", background="#eeeeee")
         self.tag_configure("disabled", background="#d14444")
 
-    def insert(self, values, disabled=False, **kwargs):
-        item_count = len(self.get_children())
-        tag = "even" if item_count % 2 == 0 else "odd"
+    def row_tag(self, position, disabled=False):
         if disabled:
-            tag = "disabled"
-        super().insert(
-            "", tk.END, iid=item_count, values=values, tags=tag, **kwargs
-        )
+            return "disabled"
+        return self.STRIPE_TAGS[position & 1]
+
+    # values of a row as they were given, without asking Tk (which would
+    # also turn numeric looking strings into ints)
+    def row_values(self, iid):
+        return self._rows[int(iid)][0]
+
+    def insert(self, values, disabled=False):
+        self.insert_many(((values, disabled),))
+
+    # appends (values, disabled) rows with direct Tcl calls, skipping the
+    # option formatting of ttk.Treeview.insert
+    def insert_many(self, rows):
+        for position, (values, disabled) in enumerate(rows, len(self._rows)):
+            self.tk.call(
+                self._w,
+                "insert",
+                "",
+                "end",
+                "-id",
+                position,
+                "-values",
+                values,
+                "-tags",
+                self.row_tag(position, disabled),
+            )
+            self._rows.append((tuple(values), disabled))
+
+    # replaces the rows of the list with the given (values, disabled)
+    # pairs, only touching the rows that actually changed. rows may be any
+    # iterable, it is only walked once. Only as many rows as were shown
+    # before, or one page, are loaded, the rest wait for load_more_rows
+    def update_rows(self, rows):
+        newRows = [(tuple(values), disabled) for values, disabled in rows]
+        loadedCount = len(self._rows)
+        # a refresh that brought nothing new leaves Tk alone
+        if (
+            newRows[:loadedCount] == self._rows
+            and newRows[loadedCount:] == self._pending_rows
+        ):
+            return
+        with self.suspend_updates():
+            self._updating = True
+            try:
+                for position, (values, disabled) in enumerate(
+                    newRows[:loadedCount]
+                ):
+                    if self._rows[position] != (values, disabled):
+                        self.item(
+                            position,
+                            values=values,
+                            tags=self.row_tag(position, disabled),
+                        )
+                if len(newRows) < len(self._rows):
+                    self.delete(*range(len(newRows), len(self._rows)))
+                    del self._rows[len(newRows):]
+                loaded = min(
+                    len(newRows), max(len(self._rows), self.PAGE_SIZE)
+                )
+                self.insert_many(newRows[len(self._rows):loaded])
+                # in step with Tk again before suspend_updates flushes the
+                # idle scroll update, which may load the next page
+                self._rows = newRows[:loaded]
+                self._pending_rows = newRows[loaded:]
+            finally:
+                self._updating = False
+
+    def load_more_rows(self):
+        if self._updating:
+            return
+        page = self._pending_rows[:self.PAGE_SIZE]
+        del self._pending_rows[:self.PAGE_SIZE]
+        self.insert_many(page)
+
+    # connects a vertical scrollbar, loading the next page of rows once
+    # the end of the list is scrolled into view
+    def attach_scrollbar(self, scrollbar):
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if float(last) >= 1.0 and self._pending_rows:
+                self.after_idle(self.load_more_rows)
+
+        self.configure(yscrollcommand=on_scroll)
+        scrollbar.configure(command=self.yview)
+
+    # detaches the scrollbar while the rows change, so the list and its
+    # scrollbar are redrawn once when the whole batch is done
+    @contextmanager
+    def suspend_updates(self):
+        scrollCommand = self.cget("yscrollcommand")
+        self.configure(yscrollcommand="")
+        try:
+            yield
+        finally:
+            self.configure(yscrollcommand=scrollCommand)
+            self.update_idletasks()
 
 
-def manage_service(action):
+# a root shell kept open for the whole session, commands are written to its
+# stdin one at a time so they don't each pay for starting sudo
+class PrivilegedShell:
+    def __init__(self):
+        self._process = None
+        # commands from different worker threads must not interleave
+        self._lock = threading.Lock()
+        # printed before each command's exit code, random for the session
+        # so no line of a command's output can be taken for it
+        self._separator = f"{BATCH_SEPARATOR}{secrets.token_hex(8)}:"
+        # set once sudo wouldn't keep a shell open, every command then
+        # gets its own sudo -S through run_command
+        self._unavailable = False
+
+    # authenticated tells that sudo has only just accepted the password,
+    # its ticket is then used without another sudo -v
+    def start(self, authenticated=False):
+        # the password only ever goes to a short-lived sudo -v. If sudo
+        # doesn't ask for it (NOPASSWD, already root) anything written to
+        # the shell's stdin would be run as a command, so the shell itself
+        # is started with -n on the ticket -v just refreshed
+        if authenticated:
+            returncode = 0
+        else:
+            returncode = run(
+                HOST_PREFIX + ['sudo', '-S', '-v'],
+                input=SUDO_STDIN,
+                stdout=DEVNULL,
+                stderr=DEVNULL,
+            ).returncode
+        if returncode == 0:
+            self._process = Popen(
+                HOST_PREFIX + ['sudo', '-n', 'sh'],
+                stdin=PIPE,
+                stdout=PIPE,
+                stderr=DEVNULL,
+                cwd=ZEROTIER_HOME,
+            )
+            # sudo -n exits straight away if the ticket isn't reused, with
+            # timestamp_timeout=0 for example
+            returncode, _ = self._exchange(self._process, "true")
+            if returncode is not None:
+                return
+            self._process = None
+            # that ticket may have been used up already, sudo -v can tell
+            if authenticated:
+                return self.start()
+        self._unavailable = True
+        log.warning(
+            "sudo won't keep a root shell open, using sudo -S per command"
+        )
+
+    # starts the shell ahead of its first command, meant to be run in a
+    # worker thread
+    def prepare(self, authenticated=False):
+        with self._lock:
+            if self._process is None and not self._unavailable:
+                self.start(authenticated)
+
+    # called from the Tk thread without the lock, a worker stuck in a hung
+    # command would hold it and freeze the GUI. The shell is terminated
+    # instead of waiting for it to run out of input
+    def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.terminate()
+
+    # writes a shell command line to process and returns its exit code and
+    # raw stdout, the exit code is None if the shell went away
+    def _exchange(self, process, commandLine):
+        # the exit code is printed on a line of its own after the output,
+        # the newline before it is removed again below
+        script = f"{commandLine}; printf '\\n{self._separator}%d\\n' $?\n"
+        separator = self._separator.encode()
+        lines = []
+        try:
+            process.stdin.write(script.encode())
+            process.stdin.flush()
+            for line in process.stdout:
+                if line.startswith(separator):
+                    return int(line[len(separator):]), b"".join(lines)[:-1]
+                lines.append(line)
+        # ValueError when close() shut stdin in the meantime
+        except (BrokenPipeError, ValueError):
+            pass
+        return None, b"".join(lines)
+
+    # runs command and returns its raw stdout, raising CalledProcessError
+    # like subprocess.run's check_returncode
+    def run(self, command, stderr_to_stdout=False):
+        redirect = "2>&1" if stderr_to_stdout else "2>/dev/null"
+        with self._lock:
+            if not self._unavailable and (
+                self._process is None or self._process.poll() is not None
+            ):
+                self.start()
+            # close() may drop self._process while the command runs
+            process = self._process
+            if process is not None:
+                returncode, stdout = self._exchange(
+                    process, f"{shlex.join(command)} {redirect} </dev/null"
+                )
+                if returncode is None:
+                    # the shell is gone, the next command starts a new one
+                    if self._process is process:
+                        self._process = None
+                    returncode = 1
+        if process is None:
+            return run_command(command, raw=True)
+        log.debug("%s exited with %d: %s", command, returncode, stdout)
+        if returncode != 0:
+            raise CalledProcessError(returncode, command, output=stdout)
+        return stdout
+
 
+ZEROTIER_SHELL = PrivilegedShell()
+
+
+# scope is "user" or "system" when it is known where the unit lives,
+# otherwise both are tried
+def service_command(action, scope=None):
     # try as user
-    try:
-        return run_command(["systemctl", "--user", action, "zerotier-one"], use_sudo=False)
-    except CalledProcessError:
-        # try as system
+    if scope != "system":
         try:
-            return run_command(["systemctl", action, "zerotier-one"])
-        except CalledProcessError as error:
-            error = error.output.decode().strip()
-            messagebox.showinfo(
-                title="Error", message=f'Error: "{error}"', icon="error"
-            )
+            return run_command(["systemctl", "--user", action, "zerotier-one"], use_sudo=False)
+        except CalledProcessError:
+            if scope == "user":
+                raise
+    # try as system
+    return run_command(["systemctl", action, "zerotier-one"])
+
+
+# the last lines of a failed command's output, only those are decoded
+def command_error_text(error):
+    if not error.output:
+        return ""
+    lines = error.output.strip().rsplit(b"\n", ERROR_OUTPUT_MAX_LINES)
+    return b"\n".join(lines[-ERROR_OUTPUT_MAX_LINES:]).decode(errors="replace")
+
+
+def manage_service(action):
+    try:
+        return service_command(action)
+    except CalledProcessError as error:
+        show_error(f'Error: "{command_error_text(error)}"')
 
 def setup_auth_token():
     if getuid() == 0:
@@ -1293,11 +1643,10 @@ def setup_auth_token():
             manage_service("start")
         else:
             _exit(0)
-    username = get_user()
     allowed_to_run_as_root = messagebox.askyesno(
         icon="info",
         title="Root access needed",
-        message=f"In order to grant {username} permission "
+        message=f"In order to grant {USER} permission "
         "to use ZeroTier we need temporary root access to "
         "add them to the zerotier-one group and change the "
         "auth-token permissions in /var/lib/zerotier-one. "
@@ -1307,7 +1656,7 @@ def setup_auth_token():
     if allowed_to_run_as_root:
         system(textwrap.dedent(
             f"""\
-            pkexec bash -c "usermod -aG zerotier-one {username} &&
+            pkexec bash -c "usermod -aG zerotier-one {USER} &&
             chmod 660 /var/lib/zerotier-one/authtoken.secret &&
             chmod 660 /var/lib/zerotier-one/identity.secret"
             """
@@ -1324,106 +1673,152 @@ def setup_auth_token():
         )
     _exit(0)
 
+def show_error(message):
+    messagebox.showinfo(title="Error", message=message, icon="error")
+
+
+def exit_not_installed():
+    show_error("ZeroTier isn't installed!")
+    print("ZeroTier isn't installed", file=sys.stderr)
+    _exit(127)
+
+
 def prompt_sudo_password():
     return simpledialog.askstring("Sudo Password", "Enter your sudo password:", show='*')
 
-def get_user():
-    return pwd.getpwuid(os.getuid())[0]
-
-def run_command(command, use_sudo=True):
-    user = get_user().strip()
+# raw=True returns the output as bytes, which parse_json accepts as is
+def run_command(command, use_sudo=True, raw=False):
     if use_sudo:
-        command = ['flatpak-spawn', '--host', 'sudo', '-S'] + command
-        # get user
-        process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=STDOUT, cwd=f"/home/{user}/.zerotier-one")
-        stdout, stderr = process.communicate(input=(SUDO_PASSWORD + '\n').encode())
+        command = HOST_PREFIX + ['sudo', '-S'] + command
+        stdin = {"input": SUDO_STDIN}
     else:
-        command = ['flatpak-spawn', '--host'] + command
-        process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=STDOUT, cwd=f"/home/{user}/.zerotier-one")
-        stdout, stderr = process.communicate()
+        command = HOST_PREFIX + command
+        # nothing is written to the command, so it doesn't get a pipe
+        stdin = {"stdin": DEVNULL}
+    result = run(command, stdout=PIPE, stderr=STDOUT, cwd=ZEROTIER_HOME, **stdin)
+    log.debug("%s exited with %d: %s", command, result.returncode, result.stdout)
+    result.check_returncode()
+
+    stdout = result.stdout
+    if use_sudo:
+        # Strip [sudo] password for <user>: from stdout, sudo prints it at
+        # most once so the scan can stop at the first match
+        stdout = stdout.replace(SUDO_PROMPT, b"", 1)
+    # decoded in a single pass, a stray invalid byte in the output is
+    # replaced instead of failing a command that succeeded
+    return stdout if raw else stdout.decode(errors="replace")
 
-    if process.returncode != 0:
-        raise CalledProcessError(process.returncode, command, output=stdout)
 
-    # Strip [sudo] password for <user>: from stdout
-    return stdout.decode().replace(f"[sudo] password for {get_user()}: ", "")
+def zerotier_cli_command(*args):
+    return ['./zerotier-cli', f"-D{ZEROTIER_HOME}"] + list(args)
 
 
-def run_zerotier_cli(*args, stderr_to_stdout=False):
-    user = get_user().strip()
-    command = ['flatpak-spawn', '--host', 'sudo', '-S', './zerotier-cli', f"-D/home/{user}/.zerotier-one"] + list(args)
-    stderr = STDOUT if stderr_to_stdout else PIPE
-    process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=stderr, cwd=f"/home/{user}/.zerotier-one")
-    stdout, stderr = process.communicate(input=(SUDO_PASSWORD + '\n').encode())
-    if process.returncode != 0:
-        raise CalledProcessError(process.returncode, command, output=stdout)
-    return stdout.decode()
+def run_zerotier_cli(*args, stderr_to_stdout=False, raw=False):
+    stdout = ZEROTIER_SHELL.run(
+        zerotier_cli_command(*args), stderr_to_stdout=stderr_to_stdout
+    )
+    return stdout if raw else stdout.decode(errors="replace")
 
-if __name__ == "__main__":
-    os.environ["FLATPAK_ID"] = "io.github.aaron777collins.zerotier-gui"
-    # temporary window for popups
-    tmp = tk.Tk()
-    tmp.withdraw()
 
-    SUDO_PASSWORD = prompt_sudo_password()
+# runs several zerotier-cli invocations in one go through the session's
+# root shell, stopping at the first one that fails
+def run_zerotier_cli_batch(argsList):
+    script = " && ".join(
+        shlex.join(zerotier_cli_command(*args)) for args in argsList
+    )
+    stdout = ZEROTIER_SHELL.run(["sh", "-c", script], stderr_to_stdout=True)
+    return stdout.decode(errors="replace")
 
-    # while loop, forcing the user to give a proper sudo password
-    while True:
-        try:
-            run_command(["true"])
-            break
-        except CalledProcessError:
-            SUDO_PASSWORD = prompt_sudo_password()
+
+def run_privileged_batch(commands):
+    if len(commands) == 1:
+        return run_command(["pkexec"] + commands[0])
+    script = " && ".join(shlex.join(c) for c in commands)
+    return run_command(["pkexec", "sh", "-c", script])
+
+
+# checks the sudo password and zerotier-cli with a single sudo call,
+# returns zerotier-cli's exit code and, when that is 0, the parsed network
+# list, or (None, None) if sudo rejected the password
+def probe_backend():
+    script = (
+        f"{shlex.join(zerotier_cli_command('-j', 'listnetworks'))} 2>/dev/null; "
+        f"echo {BATCH_SEPARATOR}$?"
+    )
+    command = HOST_PREFIX + ['sudo', '-S', 'sh', '-c', script]
+    result = run(
+        command, input=SUDO_STDIN, stdout=PIPE, stderr=DEVNULL, cwd=ZEROTIER_HOME
+    )
+    output, separator, returncode = result.stdout.rpartition(
+        BATCH_SEPARATOR.encode()
+    )
+    if not separator:
+        return None, None
+    returncode = int(returncode)
+    return returncode, parse_json(output) if returncode == 0 else None
+
+if __name__ == "__main__":
+    os.environ["FLATPAK_ID"] = "io.github.aaron777collins.zerotier-gui"
+    logging.basicConfig(level=logging.DEBUG if DEBUG_MODE else logging.WARNING)
+    # the root stays hidden while the startup popups are shown and becomes
+    # the main window afterwards, so only one Tk interpreter is ever created
+    root = tk.Tk(className="zerotier-gui")
+    root.withdraw()
+
+    # checks the password and zerotier-cli in one go, giving the user a few
+    # tries to enter a proper sudo password
+    try:
+        for _attempt in range(MAX_PASSWORD_ATTEMPTS):
+            password = prompt_sudo_password()
+            # the dialog was cancelled
+            if password is None:
+                _exit(1)
+            # the password never changes, so it is encoded for sudo's stdin
+            # only once
+            SUDO_STDIN = (password + '\n').encode()
+            returncode, networks = probe_backend()
+            if returncode is not None:
+                break
+        else:
+            show_error("Incorrect sudo password.")
+            _exit(1)
+    except FileNotFoundError:
+        exit_not_installed()
+    # the password is known to be right now, so the root shell is started
+    # on the probe's ticket in the background, overlapping the service
+    # checks and the main window instead of delaying its first command
+    threading.Thread(
+        target=ZEROTIER_SHELL.prepare, args=(True,), daemon=True
+    ).start()
 
     # simple check for zerotier
-    while True:
-        try:
-            run_zerotier_cli("listnetworks")
-        # in case the command throws an error
-        except CalledProcessError as error:
-            # no zerotier authtoken
-            if error.returncode == 2:
-                messagebox.showinfo(
-                    title="Error",
-                    icon="error",
-                    message="This user doesn't have access to ZeroTier!",
-                )
-                setup_auth_token()
-                continue
-            # service not running
-            if error.returncode == 1:
-                allowed_to_enable_service = messagebox.askyesno(
-                    icon="error",
-                    title="ZeroTier-One Service",
-                    message="The 'zerotier-one' service isn't running.\n\n"
-                    "Do you wish to grant root access to enable it?",
-                )
-                if allowed_to_enable_service:
-                    manage_service("start")
-                else:
-                    _exit(1)
-            # in case there's no command
-            if error.returncode == 127:
-                messagebox.showinfo(
-                    title="Error",
-                    message="ZeroTier isn't installed!",
-                    icon="error",
-                )
-                print("ZeroTier isn't installed", file=sys.stderr)
-                _exit(127)
-            break
-        except FileNotFoundError:
-            messagebox.showinfo(
-                title="Error",
-                message="ZeroTier isn't installed!",
+    setupAttempts = 0
+    while returncode != 0:
+        # no zerotier authtoken, setup_auth_token only comes back when
+        # running as root, so give up if that doesn't help either
+        if returncode == 2 and setupAttempts < MAX_SETUP_ATTEMPTS:
+            show_error("This user doesn't have access to ZeroTier!")
+            setup_auth_token()
+            setupAttempts += 1
+            returncode, networks = probe_backend()
+            continue
+        # service not running
+        if returncode == 1:
+            allowed_to_enable_service = messagebox.askyesno(
                 icon="error",
+                title="ZeroTier-One Service",
+                message="The 'zerotier-one' service isn't running.\n\n"
+                "Do you wish to grant root access to enable it?",
             )
-            print("ZeroTier isn't installed", file=sys.stderr)
-            _exit(127)
+            if allowed_to_enable_service:
+                manage_service("start")
+            else:
+                _exit(1)
+        # in case there's no command
+        if returncode == 127:
+            exit_not_installed()
         break
-    # destroy temporary window
-    tmp.destroy()
     # create mainwindow class and execute the mainloop
-    mainWindow = MainWindow()
+    mainWindow = MainWindow(root, networks)
     mainWindow.window.protocol("WM_DELETE_WINDOW", mainWindow.on_exit)
     mainWindow.window.mainloop()